@@ -43,15 +43,14 @@ class ClaudeCodeBot:
         """Initialize bot application."""
         logger.info("Initializing Telegram bot")
 
+        from .handlers.live_streaming import LiveStreamHandler
+
         # Create application
         builder = Application.builder()
         builder.token(self.settings.telegram_token_str)
 
-        # Configure connection settings
-        builder.connect_timeout(30)
-        builder.read_timeout(30)
-        builder.write_timeout(30)
-        builder.pool_timeout(30)
+        # Configure connection settings (shared pool sized for live streaming)
+        LiveStreamHandler.configure_request(builder, timeout=30)
 
         self.app = builder.build()
 
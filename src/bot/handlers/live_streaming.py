@@ -6,18 +6,184 @@ showing tools being used, todos, and progress with a cancel button.
 
 import asyncio
 import re
-import time
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional
+from datetime import timedelta
+from functools import partial
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    List,
+    NamedTuple,
+    Optional,
+    Tuple,
+)
 
 import structlog
-from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Message, Update
-from telegram.ext import ContextTypes
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import RetryAfter
+from telegram.ext import ApplicationBuilder
+from telegram.request import HTTPXRequest
 
 from ...claude.integration import StreamUpdate
 
 logger = structlog.get_logger()
 
+# Most recent tool messages tracked per stream; older entries are evicted
+MAX_TOOL_MESSAGES = 64
+
+# Per-chat token bucket for outgoing requests (Telegram allows ~1 msg/s/chat)
+CHAT_RATE_LIMIT = 1.0  # Requests per second
+CHAT_BURST = 3  # Requests allowed back-to-back before pacing kicks in
+MAX_FLOOD_RETRIES = 3
+
+# Shared HTTP connection pool for bot requests; concurrent edits across many
+# streams must not exhaust it
+CONNECTION_POOL_SIZE = 256
+
+# Todo list formats: "- [ ] task" / "- [x] task", "1. task (status)" and
+# emoji-prefixed "⏳ task", fused so content is scanned once
+_TODO_RE = re.compile(
+    r"(?:[-*]\s*\[(?P<chk>[ x])\]\s*(?P<t1>.+?)(?:\n|$))"
+    r"|(?:\d+\.\s*(?P<t2>.+?)\s*\((?P<st>\w+)\))"
+    r"|(?:(?P<emoji>[⏳🔄✅])\s*(?P<t3>.+?)(?:\n|$))",
+    re.MULTILINE,
+)
+
+_STATUS_ICONS = {
+    "pending": "⏳",
+    "in_progress": "🔄",
+    "completed": "✅",
+}
+
+_TODO_EMOJI_STATUS = {icon: status for status, icon in _STATUS_ICONS.items()}
+
+# Deletes status emojis from todo text in one pass
+_TODO_EMOJI_STRIP = str.maketrans("", "", "".join(_TODO_EMOJI_STATUS))
+
+# Progress bars for 0-10 filled segments
+_PROGRESS_BARS = tuple("█" * i + "░" * (10 - i) for i in range(11))
+
+# Status emoji per tool; unknown tools fall back to a generic one
+_TOOL_EMOJIS = {
+    "Read": "📖",
+    "Write": "✍️",
+    "Edit": "📝",
+    "Bash": "⚡",
+    "Glob": "🔍",
+    "Grep": "🔎",
+    "Task": "🎯",
+    "WebFetch": "🌐",
+    "WebSearch": "🔍",
+}
+
+
+def _text_signature(text: str) -> Tuple[int, int]:
+    """Cheap fingerprint used to skip edits that would not change a message."""
+    return len(text), hash(text)
+
+
+def _safe_truncate(text: str, limit: int = 4000) -> str:
+    """Truncate text at a line or word break and close open Markdown entities.
+
+    Cutting mid-word can split an emoji sequence or leave a bold, italic or
+    code entity unclosed, which Telegram rejects when parsing Markdown.
+    """
+    if len(text) <= limit:
+        return text
+
+    cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = text.rfind(" ", 0, limit)
+    if cut < limit // 2:
+        cut = limit
+    truncated = text[:cut]
+    return truncated + _markdown_closers(truncated)
+
+
+def _markdown_closers(text: str) -> str:
+    """Return the delimiters that close Markdown entities left open in text.
+
+    Only ``*`` and ``_`` outside code spans count, since Telegram treats
+    them literally inside code.
+    """
+    # Inside an open code block other delimiters are literal
+    if text.count("```") % 2:
+        return "\n```"
+
+    segments = text.split("`")
+    closers = "`" if len(segments) % 2 == 0 else ""
+
+    outside_code = segments[::2]
+    for delimiter in ("*", "_"):
+        if sum(segment.count(delimiter) for segment in outside_code) % 2:
+            closers += delimiter
+    return closers
+
+
+def _markdown_safe(text: str) -> bool:
+    """Cheaply check that Markdown entities in text are balanced."""
+    return not _markdown_closers(text)
+
+
+def _todo_from_match(match: re.Match) -> Dict:
+    """Build a todo item from a ``_TODO_RE`` match."""
+    if match.group("t1") is not None:
+        content_text = match.group("t1").strip()
+        status = "completed" if match.group("chk") == "x" else "pending"
+    elif match.group("t2") is not None:
+        content_text = match.group("t2").strip()
+        status = match.group("st")
+    else:
+        content_text = match.group("t3").strip()
+        status = _TODO_EMOJI_STATUS[match.group("emoji")]
+
+    # Inline status markers override the list format
+    if "✅" in content_text:
+        status = "completed"
+    elif "🔄" in content_text:
+        status = "in_progress"
+
+    return {
+        "content": content_text.translate(_TODO_EMOJI_STRIP).strip(),
+        "status": status
+    }
+
+
+def _scan_assistant_delta(
+    content: str,
+    last_offset: int,
+    final: bool = False
+) -> Tuple[List[Dict], int]:
+    """Extract todos from content appended after ``last_offset``.
+
+    Scans the accumulated buffer in place between offsets, so the delta
+    is never copied. Only complete lines are scanned unless ``final`` is
+    set. Returns the todos found and the offset to resume from.
+    """
+    if final:
+        end = len(content)
+    else:
+        end = content.rfind("\n", last_offset) + 1
+        if end <= last_offset:
+            return [], last_offset
+
+    todos = [
+        _todo_from_match(match)
+        for match in _TODO_RE.finditer(content, last_offset, end)
+    ]
+    return todos, end
+
+
+class _PendingRequest(NamedTuple):
+    """A queued Telegram request and the futures waiting on its outcome."""
+
+    make_request: Callable[[], Awaitable[Any]]
+    futures: List[asyncio.Future]
+
 
 @dataclass
 class LiveStreamContext:
@@ -27,22 +193,46 @@ class LiveStreamContext:
     chat_id: int
     original_message_id: int
 
-    # Message tracking
-    status_message: Optional[Message] = None
-    content_message: Optional[Message] = None  # Main response message
-    tool_messages: Dict[str, Message] = field(default_factory=dict)
-    todo_message: Optional[Message] = None
+    # Message tracking by message ID, so full Message objects aren't retained
+    status_message_id: Optional[int] = None
+    content_message_id: Optional[int] = None  # Main response message
+    tool_messages: "OrderedDict[str, Optional[int]]" = field(
+        default_factory=OrderedDict
+    )
+    todo_message_id: Optional[int] = None
     current_todos: List[Dict] = field(default_factory=list)
 
+    # Incremental todo scanning: only complete lines past the offset are
+    # scanned, and todos are merged by normalized content
+    _todo_scan_offset: int = field(default=0, repr=False)
+    _todo_index: Dict[str, Dict] = field(default_factory=dict, repr=False)
+
     # Content streaming
     accumulated_content: str = ""
-    last_update_time: float = 0.0
     update_throttle: float = 0.3  # Update every 300ms max
 
+    # Trailing-edge debouncer: updates set the flag, the flusher edits
+    _dirty: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    _flush_task: Optional[asyncio.Task] = field(default=None, repr=False)
+    _flushing: bool = field(default=False, repr=False)
+    _closing: bool = field(default=False, repr=False)
+    _todo_dirty: bool = field(default=False, repr=False)
+
+    # Signatures of the last text sent, to skip "message is not modified" edits
+    _last_status_sig: Optional[Tuple[int, int]] = field(default=None, repr=False)
+    _last_content_sig: Optional[Tuple[int, int]] = field(default=None, repr=False)
+    _last_todo_sig: Optional[Tuple[int, int]] = field(default=None, repr=False)
+
     # Control
-    cancel_requested: bool = False
+    cancel_event: asyncio.Event = field(default_factory=asyncio.Event)
     process_id: Optional[str] = None
 
+    # Cancel keyboards, built once per stream and reused on every edit
+    _stop_markup: Optional[InlineKeyboardMarkup] = field(default=None, repr=False)
+    _stop_claude_markup: Optional[InlineKeyboardMarkup] = field(
+        default=None, repr=False
+    )
+
     # Stats
     tools_count: int = 0
     messages_sent: int = 0
@@ -51,10 +241,63 @@ class LiveStreamContext:
 class LiveStreamHandler:
     """Handle live streaming updates from Claude Code as separate Telegram messages."""
 
+    @classmethod
+    def configure_request(
+        cls,
+        app_builder: ApplicationBuilder,
+        timeout: float = 30.0
+    ) -> ApplicationBuilder:
+        """Configure the bot's HTTP connection pools for live streaming.
+
+        All bot API calls share one keep-alive HTTP/1.1 pool sized for
+        concurrent edits; long polling gets its own small pool so it never
+        competes with them.
+        """
+        app_builder.request(
+            HTTPXRequest(
+                connection_pool_size=CONNECTION_POOL_SIZE,
+                connect_timeout=timeout,
+                read_timeout=timeout,
+                write_timeout=timeout,
+                pool_timeout=timeout,
+                http_version="1.1",
+            )
+        )
+        app_builder.get_updates_request(
+            HTTPXRequest(
+                connection_pool_size=1,
+                connect_timeout=timeout,
+                read_timeout=timeout,
+                write_timeout=timeout,
+                pool_timeout=timeout,
+                http_version="1.1",
+            )
+        )
+        return app_builder
+
     def __init__(self, bot_application):
         self.bot = bot_application.bot
         self.active_streams: Dict[str, LiveStreamContext] = {}
 
+        # Outgoing requests are serialized per chat by a single worker task.
+        # Pending requests are keyed so a newer edit of the same message
+        # replaces the queued one instead of being sent after it.
+        self._chat_queues: Dict[int, "OrderedDict[Hashable, _PendingRequest]"] = {}
+        self._chat_wakeups: Dict[int, asyncio.Event] = {}
+        self._chat_workers: Dict[int, asyncio.Task] = {}
+
+        # Update handlers keyed by update type; assistant updates are split
+        # by whether they carry content or tool calls
+        self._dispatch: Dict[
+            str, Callable[[LiveStreamContext, StreamUpdate], Awaitable[None]]
+        ] = {
+            "assistant_content": self._handle_assistant_message,
+            "assistant_tools": self._handle_tool_calls,
+            "tool_result": self._handle_tool_result,
+            "progress": self._handle_progress,
+            "error": self._handle_error,
+        }
+
     async def start_stream(
         self,
         user_id: int,
@@ -70,19 +313,25 @@ class LiveStreamHandler:
             process_id=process_id
         )
 
-        # Create initial status message with cancel button
-        keyboard = [[InlineKeyboardButton("🛑 Stop Claude", callback_data=f"cancel:{process_id}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        # Build cancel buttons once for the lifetime of the stream
+        callback_data = f"cancel:{process_id}"
+        context._stop_markup = InlineKeyboardMarkup(
+            [[InlineKeyboardButton("🛑 Stop", callback_data=callback_data)]]
+        )
+        context._stop_claude_markup = InlineKeyboardMarkup(
+            [[InlineKeyboardButton("🛑 Stop Claude", callback_data=callback_data)]]
+        )
 
-        status_msg = await self.bot.send_message(
-            chat_id=chat_id,
-            text="🤖 **Claude is starting...**",
+        # Create initial status message with cancel button
+        context.status_message_id = await self._send(
+            context,
+            "🤖 **Claude is starting...**",
             parse_mode="Markdown",
-            reply_markup=reply_markup,
+            reply_markup=context._stop_claude_markup,
             reply_to_message_id=original_message_id
         )
 
-        context.status_message = status_msg
+        context._flush_task = asyncio.create_task(self._flusher(context))
         self.active_streams[process_id] = context
 
         logger.info(
@@ -105,27 +354,23 @@ class LiveStreamHandler:
             return
 
         # Check for cancellation
-        if context.cancel_requested:
+        if context.cancel_event.is_set():
             logger.info("Stream cancelled by user", process_id=process_id)
             return
 
-        try:
-            # Handle different update types
-            if update.type == "assistant" and update.content:
-                await self._handle_assistant_message(context, update)
-
-            elif update.type == "assistant" and update.tool_calls:
-                await self._handle_tool_calls(context, update)
+        key = update.type
+        if key == "assistant":
+            if update.content:
+                key = "assistant_content"
+            elif update.tool_calls:
+                key = "assistant_tools"
 
-            elif update.type == "tool_result":
-                await self._handle_tool_result(context, update)
-
-            elif update.type == "progress":
-                await self._handle_progress(context, update)
-
-            elif update.type == "error":
-                await self._handle_error(context, update)
+        handler = self._dispatch.get(key)
+        if not handler:
+            return
 
+        try:
+            await handler(context, update)
         except Exception as e:
             logger.error(
                 "Error handling stream update",
@@ -146,26 +391,79 @@ class LiveStreamHandler:
         # Accumulate content
         context.accumulated_content += update.content
 
-        # Extract todos from accumulated message
-        todos = self._extract_todos(context.accumulated_content)
-        if todos and todos != context.current_todos:
-            context.current_todos = todos
-            await self._update_todo_display(context, todos)
-
-        # Throttle updates to avoid hitting Telegram rate limits
-        # Update every 300ms or when content is substantial
-        current_time = time.time()
-        time_since_update = current_time - context.last_update_time
-        content_length = len(context.accumulated_content)
-
-        should_update = (
-            time_since_update >= context.update_throttle or
-            content_length % 200 == 0  # Update every ~200 chars
-        )
+        # Extract todos from newly completed lines only
+        if self._scan_todo_delta(context):
+            context._todo_dirty = True
 
-        if should_update:
-            await self._update_content_message(context)
-            context.last_update_time = current_time
+        # Let the flusher pick up the latest content and todos on its next tick
+        context._dirty.set()
+
+    async def _flusher(self, context: LiveStreamContext):
+        """Flush accumulated content at most once per throttle interval.
+
+        Bursts of assistant updates only mark the context dirty, so each
+        tick collapses them into a single edit with the latest content.
+        Waits race the cancel event so a stop request exits promptly, but a
+        flush is never interrupted: a message already being sent must have
+        its ID recorded so finalize can remove its stop button.
+        """
+        cancelled = asyncio.ensure_future(context.cancel_event.wait())
+        try:
+            while True:
+                if not await self._until_cancelled(
+                    cancelled, context._dirty.wait()
+                ):
+                    return
+                context._dirty.clear()
+
+                context._flushing = True
+                try:
+                    await self._flush(context)
+                finally:
+                    context._flushing = False
+                if context._closing or cancelled.done():
+                    return
+
+                # Pace edits, waking early on cancel
+                if not await self._until_cancelled(
+                    cancelled, asyncio.sleep(context.update_throttle)
+                ):
+                    return
+        finally:
+            cancelled.cancel()
+
+    async def _until_cancelled(
+        self,
+        cancelled: asyncio.Future,
+        work: Awaitable[Any]
+    ) -> bool:
+        """Run work until it finishes or the stream is cancelled.
+
+        Returns False if cancellation won; the work is then cancelled.
+        """
+        task = asyncio.ensure_future(work)
+        try:
+            await asyncio.wait(
+                {task, cancelled}, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            if not task.done():
+                task.cancel()
+        return task.done() and not task.cancelled()
+
+    async def _flush(self, context: LiveStreamContext):
+        """Send the latest content and, if changed, todos concurrently."""
+        requests = [self._update_content_message(context)]
+        if context._todo_dirty:
+            context._todo_dirty = False
+            requests.append(
+                self._update_todo_display(context, context.current_todos)
+            )
+
+        results = await asyncio.gather(*requests, return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                logger.warning("Failed to flush stream update", error=str(result))
 
     async def _update_content_message(
         self,
@@ -175,48 +473,97 @@ class LiveStreamHandler:
         if not context.accumulated_content:
             return
 
-        # Prepare content with stop button
-        keyboard = [[InlineKeyboardButton("🛑 Stop", callback_data=f"cancel:{context.process_id}")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-
         # Truncate if too long (Telegram limit is 4096 chars)
         content = context.accumulated_content
         if len(content) > 4000:
-            content = content[:4000] + "\n\n_...response continues..._"
+            content = _safe_truncate(content) + "\n\n_...response continues..._"
 
-        try:
-            if context.content_message:
-                # Update existing message
-                await context.content_message.edit_text(
-                    content,
-                    parse_mode="Markdown",
-                    reply_markup=reply_markup
-                )
-            else:
-                # Create new content message
-                context.content_message = await self.bot.send_message(
-                    chat_id=context.chat_id,
-                    text=content,
-                    parse_mode="Markdown",
-                    reply_markup=reply_markup
-                )
-                context.messages_sent += 1
+        signature = _text_signature(content)
+        if signature == context._last_content_sig:
+            return
 
-                # Update status to show we're streaming
-                await self._update_status(context, "💬 **Streaming response...**")
+        # Partial responses often have unbalanced entities that Telegram
+        # would reject, so send those as plain text up front
+        parse_mode = "Markdown" if _markdown_safe(content) else None
+
+        if context.content_message_id:
+            # Update existing message in the background
+            context._last_content_sig = signature
+            edit = self._edit(
+                context,
+                context.content_message_id,
+                content,
+                parse_mode=parse_mode,
+                reply_markup=context._stop_markup
+            )
+            self._on_failure(
+                edit,
+                partial(
+                    self._content_edit_failed, context, content, signature, parse_mode
+                )
+            )
+            return
 
+        # Create new content message; its ID is needed for later edits
+        try:
+            context.content_message_id = await self._send(
+                context,
+                content,
+                parse_mode=parse_mode,
+                reply_markup=context._stop_markup
+            )
         except Exception as e:
+            if parse_mode is None:
+                logger.warning("Failed to update content message", error=str(e))
+                return
+
             # Fallback to plain text if markdown fails
             try:
-                if context.content_message:
-                    await context.content_message.edit_text(content)
-                else:
-                    context.content_message = await self.bot.send_message(
-                        chat_id=context.chat_id,
-                        text=content
-                    )
+                context.content_message_id = await self._send(
+                    context, content, reply_markup=context._stop_markup
+                )
             except Exception as e2:
                 logger.warning("Failed to update content message", error=str(e2))
+                return
+
+        context._last_content_sig = signature
+        context.messages_sent += 1
+
+        # Update status to show we're streaming
+        await self._update_status(context, "💬 **Streaming response...**")
+
+    def _content_edit_failed(
+        self,
+        context: LiveStreamContext,
+        content: str,
+        signature: Tuple[int, int],
+        parse_mode: Optional[str],
+        error: BaseException
+    ):
+        """Retry a failed content edit as plain text, unless superseded.
+
+        Once the stream is closing the retry drops the stop button, since
+        it may be sent after finalize has already removed it.
+        """
+        if context._last_content_sig != signature:
+            return  # Newer content was queued and replaces this edit
+
+        if parse_mode is None:
+            context._last_content_sig = None
+            logger.warning("Failed to update content message", error=str(error))
+            return
+
+        # Fallback to plain text if markdown fails
+        fallback = self._edit(
+            context,
+            context.content_message_id,
+            content,
+            reply_markup=None if context._closing else context._stop_markup
+        )
+        self._on_failure(
+            fallback,
+            partial(self._content_edit_failed, context, content, signature, None)
+        )
 
     async def _handle_tool_calls(
         self,
@@ -227,24 +574,24 @@ class LiveStreamHandler:
         if not update.tool_calls:
             return
 
-        # Collect all tool names
-        tool_names = []
-        for tool_call in update.tool_calls:
-            tool_name = tool_call.get("name", "Unknown")
-            tool_id = tool_call.get("id", str(context.tools_count))
+        tool_calls = update.tool_calls
 
-            tool_emoji = self._get_tool_emoji(tool_name)
-            tool_names.append(f"{tool_emoji} {tool_name}")
-
-            # Track tool IDs for potential result updates
+        # Track tool IDs for potential result updates; a repeated ID becomes
+        # the most recently used entry
+        for i, tool_call in enumerate(tool_calls):
+            tool_id = tool_call.get("id", str(context.tools_count + i))
             context.tool_messages[tool_id] = None
-            context.tools_count += 1
-
-        # Update status message with current tools
-        if tool_names:
-            tools_text = ", ".join(tool_names)
-            status_text = f"🔧 **Using tools:** {tools_text}\n\n_Working..._"
-            await self._update_status(context, status_text)
+            context.tool_messages.move_to_end(tool_id)
+        context.tools_count += len(tool_calls)
+        self._trim_tool_messages(context)
+
+        # Update status message with current tools in a single edit
+        tools_text = ", ".join(
+            f"{self._get_tool_emoji(name)} {name}"
+            for name in (tool_call.get("name", "Unknown") for tool_call in tool_calls)
+        )
+        status_text = f"🔧 **Using tools:** {tools_text}\n\n_Working..._"
+        await self._update_status(context, status_text)
 
     async def _handle_tool_result(
         self,
@@ -252,10 +599,19 @@ class LiveStreamHandler:
         update: StreamUpdate
     ):
         """Handle tool result - just update status if there's an error."""
+        tool_id = (update.metadata or {}).get("tool_use_id")
+        if tool_id in context.tool_messages:
+            context.tool_messages.move_to_end(tool_id)
+
         if update.is_error():
             error_msg = update.get_error_message()
             await self._update_status(context, f"⚠️ **Tool error:** {error_msg}")
 
+    def _trim_tool_messages(self, context: LiveStreamContext):
+        """Evict the least recently used tool messages beyond the cap."""
+        while len(context.tool_messages) > MAX_TOOL_MESSAGES:
+            context.tool_messages.popitem(last=False)
+
     async def _handle_progress(
         self,
         context: LiveStreamContext,
@@ -268,9 +624,8 @@ class LiveStreamHandler:
         status_text = f"🔄 **{progress_text}**"
 
         if percentage is not None:
-            # Create progress bar
-            filled = int(percentage / 10)
-            bar = "█" * filled + "░" * (10 - filled)
+            # Pick the precomputed bar, clamping out-of-range percentages
+            bar = _PROGRESS_BARS[max(0, min(10, int(percentage / 10)))]
             status_text += f"\n\n`{bar}` {percentage}%"
 
         await self._update_status(context, status_text)
@@ -283,9 +638,9 @@ class LiveStreamHandler:
         """Handle error messages."""
         error_msg = update.get_error_message() or "An error occurred"
 
-        await self.bot.send_message(
-            chat_id=context.chat_id,
-            text=f"❌ **Error**\n\n{error_msg}",
+        await self._send(
+            context,
+            f"❌ **Error**\n\n{error_msg}",
             parse_mode="Markdown"
         )
 
@@ -297,22 +652,29 @@ class LiveStreamHandler:
         text: str
     ):
         """Update the status message."""
-        if not context.status_message:
+        if not context.status_message_id:
             return
 
-        keyboard = [[
-            InlineKeyboardButton("🛑 Stop Claude", callback_data=f"cancel:{context.process_id}")
-        ]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+        signature = _text_signature(text)
+        if signature == context._last_status_sig:
+            return
 
-        try:
-            await context.status_message.edit_text(
-                text,
-                parse_mode="Markdown",
-                reply_markup=reply_markup
-            )
-        except Exception as e:
-            logger.warning("Failed to update status message", error=str(e))
+        # Edit in the background so Telegram pacing never blocks the stream
+        context._last_status_sig = signature
+        edit = self._edit(
+            context,
+            context.status_message_id,
+            text,
+            parse_mode="Markdown",
+            reply_markup=context._stop_claude_markup
+        )
+
+        def failed(error: BaseException):
+            if context._last_status_sig == signature:
+                context._last_status_sig = None
+            logger.warning("Failed to update status message", error=str(error))
+
+        self._on_failure(edit, failed)
 
     async def _update_todo_display(
         self,
@@ -324,95 +686,82 @@ class LiveStreamHandler:
             return
 
         # Format todos
-        todo_text = "📋 **Claude's Task List:**\n\n"
+        parts = ["📋 **Claude's Task List:**\n\n"]
+        for todo in todos:
+            status_icon = _STATUS_ICONS.get(todo.get("status", "pending"), "📌")
+            content = todo.get("content", "Unknown task")
+            parts.append(f"{status_icon} {content}\n")
+        todo_text = "".join(parts)
 
-        for i, todo in enumerate(todos, 1):
-            status_icon = {
-                "pending": "⏳",
-                "in_progress": "🔄",
-                "completed": "✅"
-            }.get(todo.get("status", "pending"), "📌")
+        signature = _text_signature(todo_text)
+        if signature == context._last_todo_sig:
+            return
 
-            content = todo.get("content", "Unknown task")
-            todo_text += f"{status_icon} {content}\n"
+        if context.todo_message_id:
+            # Update existing message in the background
+            context._last_todo_sig = signature
+            edit = self._edit(
+                context,
+                context.todo_message_id,
+                todo_text,
+                parse_mode="Markdown",
+                reply_markup=context._stop_markup
+            )
 
-        keyboard = [[
-            InlineKeyboardButton("🛑 Stop", callback_data=f"cancel:{context.process_id}")
-        ]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
+            def failed(error: BaseException):
+                if context._last_todo_sig == signature:
+                    context._last_todo_sig = None
+                logger.warning("Failed to update todo message", error=str(error))
 
-        if context.todo_message:
-            # Update existing message
-            try:
-                await context.todo_message.edit_text(
-                    todo_text,
-                    parse_mode="Markdown",
-                    reply_markup=reply_markup
-                )
-            except Exception as e:
-                logger.warning("Failed to update todo message", error=str(e))
+            self._on_failure(edit, failed)
         else:
             # Create new message
-            context.todo_message = await self.bot.send_message(
-                chat_id=context.chat_id,
-                text=todo_text,
+            context.todo_message_id = await self._send(
+                context,
+                todo_text,
                 parse_mode="Markdown",
-                reply_markup=reply_markup
+                reply_markup=context._stop_markup
             )
+            context._last_todo_sig = signature
             context.messages_sent += 1
 
     def _extract_todos(self, content: str) -> List[Dict]:
         """Extract todo items from Claude's message.
 
         Looks for TodoWrite tool usage or formatted todo lists in the content.
+        All supported formats are matched in a single pass over the content.
         """
-        todos = []
-
-        # Pattern 1: Look for TodoWrite mentions
-        # Pattern: "- [ ] task" or "- [x] task" or "1. task (status)"
-        todo_patterns = [
-            r'[-*]\s*\[[ x]\]\s*(.+?)(?:\n|$)',  # - [ ] or - [x] format
-            r'\d+\.\s*(.+?)\s*\((\w+)\)',  # 1. task (pending) format
-            r'(?:⏳|🔄|✅)\s*(.+?)(?:\n|$)',  # Emoji prefix format
-        ]
-
-        for pattern in todo_patterns:
-            matches = re.findall(pattern, content, re.MULTILINE)
-            for match in matches:
-                if isinstance(match, tuple):
-                    content_text = match[0].strip()
-                    status = match[1] if len(match) > 1 else "pending"
-                else:
-                    content_text = match.strip()
-                    status = "pending"
+        return [_todo_from_match(match) for match in _TODO_RE.finditer(content)]
+
+    def _scan_todo_delta(
+        self,
+        context: LiveStreamContext,
+        final: bool = False
+    ) -> bool:
+        """Scan content appended since the last scan for todo items.
 
-                # Determine status from content or markers
-                if "✅" in content_text or "[x]" in content.lower():
-                    status = "completed"
-                elif "🔄" in content_text:
-                    status = "in_progress"
+        Only complete lines are scanned unless ``final`` is set, so a todo
+        split across chunks is picked up once its line is finished.
+        Returns True if the todo list changed.
+        """
+        todos, context._todo_scan_offset = _scan_assistant_delta(
+            context.accumulated_content, context._todo_scan_offset, final
+        )
 
-                todos.append({
-                    "content": content_text.replace("✅", "").replace("🔄", "").replace("⏳", "").strip(),
-                    "status": status
-                })
+        changed = False
+        for todo in todos:
+            key = todo["content"].lower()
+            if context._todo_index.get(key) != todo:
+                context._todo_index[key] = todo
+                changed = True
 
-        return todos
+        if changed:
+            context.current_todos = list(context._todo_index.values())
+        return changed
 
     def _get_tool_emoji(self, tool_name: str) -> str:
         """Get emoji for tool name."""
-        emojis = {
-            "Read": "📖",
-            "Write": "✍️",
-            "Edit": "📝",
-            "Bash": "⚡",
-            "Glob": "🔍",
-            "Grep": "🔎",
-            "Task": "🎯",
-            "WebFetch": "🌐",
-            "WebSearch": "🔍",
-        }
-        return emojis.get(tool_name, "🔧")
+        return _TOOL_EMOJIS.get(tool_name, "🔧")
 
     async def finalize_stream(
         self,
@@ -425,34 +774,57 @@ class LiveStreamHandler:
         if not context:
             return
 
-        # Do final update of content message
-        if context.accumulated_content:
-            await self._update_content_message(context)
-
-        # Remove stop button from content message
-        if context.content_message:
-            try:
-                await context.content_message.edit_reply_markup(reply_markup=None)
-            except Exception:
-                pass
-
-        # Update status message with final state
-        if context.status_message:
-            try:
-                icon = "❌" if is_error else "✅"
-                await context.status_message.edit_text(
+        # Stop the flusher before the final update so edits don't race
+        await self._stop_flusher(context)
+
+        # Do final update of content and todos, including the trailing line.
+        # Todos are always resent since the flusher may have been stopped
+        # mid-flush; unchanged text is skipped by the signature check.
+        # A cancelled stream keeps whatever was already shown.
+        if context.accumulated_content and not context.cancel_event.is_set():
+            self._scan_todo_delta(context, final=True)
+            context._todo_dirty = True
+            await self._flush(context)
+
+        # Show the final state first, then remove the stop buttons. These
+        # go through the paced chat queue in the background: the caller
+        # sends Claude's answer once this returns, and waiting out the
+        # pacing would delay it by seconds. The answer may therefore arrive
+        # before the buttons are gone.
+        requests = []
+        if context.status_message_id:
+            icon = "❌" if is_error else "✅"
+            requests.append(
+                self._edit(
+                    context,
+                    context.status_message_id,
                     f"{icon} **Claude finished**",
                     parse_mode="Markdown"
                 )
-            except Exception:
-                pass
+            )
+        requests.extend(
+            self._enqueue(
+                context.chat_id,
+                partial(
+                    self.bot.edit_message_reply_markup,
+                    chat_id=context.chat_id,
+                    message_id=message_id,
+                    reply_markup=None
+                )
+            )
+            for message_id in (
+                *context.tool_messages.values(),
+                context.todo_message_id,
+                context.content_message_id,
+            )
+            if message_id
+        )
 
-        # Remove cancel button from todo message
-        if context.todo_message:
-            try:
-                await context.todo_message.edit_reply_markup(reply_markup=None)
-            except Exception:
-                pass
+        def failed(error: BaseException):
+            logger.debug("Failed to finalize stream message", error=str(error))
+
+        for request in requests:
+            self._on_failure(request, failed)
 
         logger.info(
             "Finalized stream",
@@ -462,8 +834,201 @@ class LiveStreamHandler:
             content_length=len(context.accumulated_content)
         )
 
-        # Clean up
-        del self.active_streams[process_id]
+        # Clean up; a concurrent finalize may already have removed it
+        self.active_streams.pop(process_id, None)
+
+    async def _stop_flusher(self, context: LiveStreamContext):
+        """Stop the content flusher task and wait for it to exit.
+
+        A flush in progress is allowed to finish, so a message being sent
+        has its ID recorded and isn't sent again by the final flush. Only
+        an idle or sleeping flusher is cancelled.
+        """
+        context._closing = True
+        task = context._flush_task
+        if not task or task.done():
+            return
+
+        if context._flushing:
+            await task
+            return
+
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    async def _send(
+        self,
+        context: LiveStreamContext,
+        text: str,
+        **kwargs: Any
+    ) -> int:
+        """Send a new message to the stream's chat and return its ID."""
+        message = await self._enqueue(
+            context.chat_id,
+            partial(
+                self.bot.send_message,
+                chat_id=context.chat_id,
+                text=text,
+                **kwargs
+            )
+        )
+        return message.message_id
+
+    def _edit(
+        self,
+        context: LiveStreamContext,
+        message_id: int,
+        text: str,
+        **kwargs: Any
+    ) -> asyncio.Future:
+        """Queue an edit of a message in the stream's chat.
+
+        A queued edit of the same message that hasn't been sent yet is
+        replaced, so only the latest text goes out. Returns a future for
+        the outcome; callers don't need to wait for it.
+        """
+        return self._enqueue(
+            context.chat_id,
+            partial(
+                self.bot.edit_message_text,
+                text=text,
+                chat_id=context.chat_id,
+                message_id=message_id,
+                **kwargs
+            ),
+            key=("edit", message_id)
+        )
+
+    def _on_failure(
+        self,
+        future: asyncio.Future,
+        callback: Callable[[BaseException], None]
+    ):
+        """Call back with the error if a background request fails."""
+
+        def done(f: asyncio.Future):
+            if not f.cancelled() and f.exception() is not None:
+                callback(f.exception())
+
+        future.add_done_callback(done)
+
+    def _enqueue(
+        self,
+        chat_id: int,
+        make_request: Callable[[], Awaitable[Any]],
+        key: Optional[Hashable] = None
+    ) -> asyncio.Future:
+        """Queue a Telegram request for a chat and return a future for it.
+
+        Requests for the same chat run one at a time, in order, paced by a
+        token bucket so bursts of edits don't trigger flood control. If a
+        request with the same ``key`` is still pending it is replaced in
+        place, and its waiters get the outcome of the newer request.
+        """
+        queue = self._chat_queues.get(chat_id)
+        if queue is None:
+            queue = self._chat_queues[chat_id] = OrderedDict()
+            self._chat_wakeups[chat_id] = asyncio.Event()
+
+        worker = self._chat_workers.get(chat_id)
+        if worker is None or worker.done():
+            self._chat_workers[chat_id] = asyncio.create_task(
+                self._chat_worker(chat_id, queue, self._chat_wakeups[chat_id])
+            )
+
+        future = asyncio.get_running_loop().create_future()
+        if key is None:
+            key = object()
+        pending = queue.get(key)
+        futures = pending.futures if pending else []
+        futures.append(future)
+        queue[key] = _PendingRequest(make_request, futures)
+
+        self._chat_wakeups[chat_id].set()
+        return future
+
+    async def _chat_worker(
+        self,
+        chat_id: int,
+        queue: "OrderedDict[Hashable, _PendingRequest]",
+        wakeup: asyncio.Event
+    ):
+        """Drain a chat's request queue, pacing requests with a token bucket.
+
+        Exits once the queue has been idle long enough for the bucket to
+        refill, so idle chats don't keep a task around.
+        """
+        loop = asyncio.get_running_loop()
+        idle_timeout = CHAT_BURST / CHAT_RATE_LIMIT
+        tokens = float(CHAT_BURST)
+        last_refill = loop.time()
+
+        while True:
+            if not queue:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=idle_timeout)
+                except asyncio.TimeoutError:
+                    if not queue:
+                        del self._chat_queues[chat_id]
+                        del self._chat_wakeups[chat_id]
+                        del self._chat_workers[chat_id]
+                        return
+                continue
+
+            # Wait for a token before taking the request, so edits queued
+            # meanwhile can still replace it
+            now = loop.time()
+            tokens = min(CHAT_BURST, tokens + (now - last_refill) * CHAT_RATE_LIMIT)
+            last_refill = now
+            if tokens < 1:
+                await asyncio.sleep((1 - tokens) / CHAT_RATE_LIMIT)
+                continue
+
+            _, (make_request, futures) = queue.popitem(last=False)
+
+            # Every caller gave up waiting on the request
+            if all(future.done() for future in futures):
+                continue
+            tokens -= 1
+
+            for attempt in range(MAX_FLOOD_RETRIES + 1):
+                try:
+                    result = await make_request()
+                except RetryAfter as e:
+                    if attempt == MAX_FLOOD_RETRIES:
+                        error = e
+                        break
+
+                    # Flood control applies to the whole chat, so pause the
+                    # queue rather than just this request
+                    retry_after = e.retry_after
+                    if isinstance(retry_after, timedelta):
+                        retry_after = retry_after.total_seconds()
+                    logger.warning(
+                        "Telegram flood control, pausing chat queue",
+                        chat_id=chat_id,
+                        retry_after=retry_after
+                    )
+                    await asyncio.sleep(retry_after)
+                    tokens, last_refill = 0.0, loop.time()
+                except Exception as e:
+                    error = e
+                    break
+                else:
+                    error = None
+                    break
+
+            for future in futures:
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(result)
+                else:
+                    future.set_exception(error)
 
     def request_cancel(self, process_id: str) -> bool:
         """Request cancellation of a stream."""
@@ -471,11 +1036,32 @@ class LiveStreamHandler:
         if not context:
             return False
 
-        context.cancel_requested = True
+        context.cancel_event.set()
+        self._drop_pending_edits(context)
         logger.info("Cancel requested", process_id=process_id)
         return True
 
+    def _drop_pending_edits(self, context: LiveStreamContext):
+        """Drop a stream's queued edits that haven't been sent yet.
+
+        Background edits have no caller waiting on them, so they are removed
+        from the chat queue rather than left to go out after the stop.
+        """
+        queue = self._chat_queues.get(context.chat_id)
+        if not queue:
+            return
+
+        for message_id in (
+            context.status_message_id,
+            context.content_message_id,
+            context.todo_message_id,
+        ):
+            pending = queue.pop(("edit", message_id), None)
+            if pending:
+                for future in pending.futures:
+                    future.cancel()
+
     def is_cancelled(self, process_id: str) -> bool:
         """Check if stream has been cancelled."""
         context = self.active_streams.get(process_id)
-        return context.cancel_requested if context else False
+        return context.cancel_event.is_set() if context else False
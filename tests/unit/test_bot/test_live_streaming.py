@@ -0,0 +1,646 @@
+"""Tests for live streaming handler."""
+
+import asyncio
+import itertools
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest
+
+from src.bot.handlers import live_streaming
+from src.bot.handlers.live_streaming import (
+    MAX_TOOL_MESSAGES,
+    LiveStreamContext,
+    LiveStreamHandler,
+    _markdown_safe,
+    _safe_truncate,
+    _scan_assistant_delta,
+)
+from src.claude.integration import StreamUpdate
+
+
+@pytest.fixture
+def mock_bot():
+    """Mock Telegram bot that returns messages with sequential IDs."""
+    message_ids = itertools.count(1)
+    bot = Mock()
+    bot.send_message = AsyncMock(
+        side_effect=lambda **kwargs: Mock(message_id=next(message_ids))
+    )
+    bot.edit_message_text = AsyncMock()
+    bot.edit_message_reply_markup = AsyncMock()
+    return bot
+
+
+@pytest.fixture
+def handler(mock_bot, monkeypatch):
+    """Create live stream handler around the mock bot."""
+    # Keep per-chat pacing out of the way of timing-sensitive tests
+    monkeypatch.setattr(live_streaming, "CHAT_RATE_LIMIT", 1000.0)
+    return LiveStreamHandler(Mock(bot=mock_bot))
+
+
+async def settle():
+    """Let background Telegram requests run."""
+    await asyncio.sleep(0.01)
+
+
+def edited_texts(bot, message_id):
+    """Texts of all edits made to a message."""
+    return [
+        call.kwargs["text"]
+        for call in bot.edit_message_text.await_args_list
+        if call.kwargs["message_id"] == message_id
+    ]
+
+
+class TestDebouncer:
+    """Test coalescing of content edits."""
+
+    async def test_burst_collapses_to_single_edit(self, handler, mock_bot):
+        """Test a burst of content updates produces one content message."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        context.update_throttle = 0.05
+
+        for i in range(20):
+            await handler.handle_update(
+                "proc", StreamUpdate(type="assistant", content=f"chunk {i} ")
+            )
+        await asyncio.sleep(0.01)
+
+        # Status message plus a single content message with the latest text
+        assert mock_bot.send_message.await_count == 2
+        assert "chunk 19" in mock_bot.send_message.await_args.kwargs["text"]
+        assert edited_texts(mock_bot, context.content_message_id) == []
+
+        await handler.finalize_stream("proc", "done")
+        assert context._flush_task.done()
+        assert "proc" not in handler.active_streams
+
+    async def test_finalize_during_send_does_not_duplicate(self, handler, mock_bot):
+        """Test finalizing while the first content send is in flight."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        send_message = mock_bot.send_message.side_effect
+
+        async def slow_send(**kwargs):
+            await asyncio.sleep(0.05)
+            return send_message(**kwargs)
+
+        mock_bot.send_message.side_effect = slow_send
+
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", content="Hello - [ ] a\n")
+        )
+        await asyncio.sleep(0.01)
+        await handler.finalize_stream("proc", "done")
+
+        sent = [call.kwargs["text"] for call in mock_bot.send_message.await_args_list]
+        assert sent.count("Hello - [ ] a\n") == 1
+        assert context.content_message_id is not None
+
+
+class TestEditDedup:
+    """Test skipping edits whose text is unchanged."""
+
+    async def test_unchanged_status_is_not_resent(self, handler, mock_bot):
+        """Test repeated identical status text issues a single edit."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+
+        await handler._update_status(context, "🔧 **Using tools:** Read")
+        await handler._update_status(context, "🔧 **Using tools:** Read")
+        await settle()
+        assert len(edited_texts(mock_bot, context.status_message_id)) == 1
+
+        await handler._update_status(context, "🔧 **Using tools:** Bash")
+        await settle()
+        assert len(edited_texts(mock_bot, context.status_message_id)) == 2
+
+        await handler.finalize_stream("proc", "done")
+
+
+class TestExtractTodos:
+    """Test todo extraction from assistant content."""
+
+    def test_extract_checkbox_todos(self, handler):
+        """Test checkbox list items with their status."""
+        todos = handler._extract_todos("- [ ] Write tests\n- [x] Fix bug\n")
+        assert todos == [
+            {"content": "Write tests", "status": "pending"},
+            {"content": "Fix bug", "status": "completed"},
+        ]
+
+    def test_extract_numbered_todos(self, handler):
+        """Test numbered items with an explicit status."""
+        todos = handler._extract_todos("1. Refactor parser (in_progress)")
+        assert todos == [{"content": "Refactor parser", "status": "in_progress"}]
+
+    def test_extract_emoji_todos(self, handler):
+        """Test emoji-prefixed items map to statuses."""
+        todos = handler._extract_todos("✅ Setup\n🔄 Build\n⏳ Deploy")
+        assert [t["status"] for t in todos] == [
+            "completed",
+            "in_progress",
+            "pending",
+        ]
+        assert [t["content"] for t in todos] == ["Setup", "Build", "Deploy"]
+
+    def test_extract_strips_inline_status_emojis(self, handler):
+        """Test inline status emojis set the status and are removed."""
+        todos = handler._extract_todos("- [ ] Ship release ✅\n")
+        assert todos == [{"content": "Ship release", "status": "completed"}]
+
+    def test_extract_no_todos(self, handler):
+        """Test plain prose yields no todos."""
+        assert handler._extract_todos("Just some regular text.") == []
+
+    def test_scan_todo_delta_merges_by_content(self, handler):
+        """Test incremental scans update todo status in place."""
+        context = LiveStreamContext(
+            user_id=1,
+            chat_id=100,
+            original_message_id=10,
+            accumulated_content="- [ ] Write tests\n- [ ] Fix",
+        )
+
+        assert handler._scan_todo_delta(context)
+        assert context.current_todos == [
+            {"content": "Write tests", "status": "pending"}
+        ]
+
+        # Partial line is not scanned until it is complete
+        context.accumulated_content += " bug\n- [x] Write tests\n"
+        assert handler._scan_todo_delta(context)
+        assert context.current_todos == [
+            {"content": "Write tests", "status": "completed"},
+            {"content": "Fix bug", "status": "pending"},
+        ]
+        assert not handler._scan_todo_delta(context)
+
+
+class TestFinalize:
+    """Test stream finalization."""
+
+    async def test_finalize_removes_buttons_despite_errors(self, handler, mock_bot):
+        """Test every message is finalized even if one request fails."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        await handler._update_todo_display(
+            context, [{"content": "Task", "status": "pending"}]
+        )
+        context.content_message_id = 99
+
+        async def edit_reply_markup(**kwargs):
+            if kwargs["message_id"] == context.todo_message_id:
+                raise RuntimeError("boom")
+
+        mock_bot.edit_message_reply_markup.side_effect = edit_reply_markup
+
+        await handler.finalize_stream("proc", "done")
+        await settle()
+
+        cleared = {
+            call.kwargs["message_id"]
+            for call in mock_bot.edit_message_reply_markup.await_args_list
+        }
+        assert cleared == {context.todo_message_id, 99}
+        assert "finished" in edited_texts(mock_bot, context.status_message_id)[-1]
+        assert "proc" not in handler.active_streams
+
+    async def test_finalize_does_not_wait_for_pacing(
+        self, handler, mock_bot, monkeypatch
+    ):
+        """Test finalize returns at once and sends the final status first."""
+        monkeypatch.setattr(live_streaming, "CHAT_RATE_LIMIT", 5.0)
+        context = await handler.start_stream(1, 100, 10, "proc")
+        await handler._update_todo_display(
+            context, [{"content": "Task", "status": "pending"}]
+        )
+        await handler._update_status(context, "🔧 **Using tools:** Read")
+        await settle()
+        mock_bot.reset_mock()
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        await handler.finalize_stream("proc", "done")
+        assert loop.time() - start < 0.1
+        assert mock_bot.edit_message_reply_markup.await_count == 0
+
+        await asyncio.sleep(0.5)
+        assert "finished" in edited_texts(mock_bot, context.status_message_id)[-1]
+        calls = [call[0] for call in mock_bot.method_calls]
+        assert calls == ["edit_message_text", "edit_message_reply_markup"]
+
+    async def test_final_plain_text_retry_drops_stop_button(self, handler, mock_bot):
+        """Test a failed final Markdown edit is retried without buttons."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        context.update_throttle = 10
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", content="See ")
+        )
+        await settle()
+
+        async def edit_message_text(**kwargs):
+            await asyncio.sleep(0.02)
+            if kwargs.get("parse_mode") == "Markdown" and "[" in kwargs["text"]:
+                raise RuntimeError("can't parse entities")
+
+        mock_bot.edit_message_text.side_effect = edit_message_text
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", content="[docs]")
+        )
+        await handler.finalize_stream("proc", "done")
+        await asyncio.sleep(0.1)
+
+        content_edits = [
+            call.kwargs
+            for call in mock_bot.edit_message_text.await_args_list
+            if call.kwargs["message_id"] == context.content_message_id
+        ]
+        assert content_edits[-1].get("parse_mode") is None
+        assert content_edits[-1]["reply_markup"] is None
+
+    async def test_finalize_twice_is_safe(self, handler):
+        """Test a second finalize for the same stream is a no-op."""
+        await handler.start_stream(1, 100, 10, "proc")
+
+        await asyncio.gather(
+            handler.finalize_stream("proc", "done"),
+            handler.finalize_stream("proc", "done"),
+        )
+        assert "proc" not in handler.active_streams
+
+
+class TestToolTracking:
+    """Test bounded tool message tracking."""
+
+    async def test_tool_messages_are_bounded(self, handler):
+        """Test old tool IDs are evicted once the cap is reached."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        tool_calls = [
+            {"id": f"tool-{i}", "name": "Read"} for i in range(MAX_TOOL_MESSAGES + 5)
+        ]
+
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", tool_calls=tool_calls)
+        )
+
+        assert len(context.tool_messages) == MAX_TOOL_MESSAGES
+        assert "tool-0" not in context.tool_messages
+        newest = next(reversed(context.tool_messages))
+        assert newest == f"tool-{MAX_TOOL_MESSAGES + 4}"
+        assert context.tools_count == MAX_TOOL_MESSAGES + 5
+
+        await handler.finalize_stream("proc", "done")
+
+    async def test_repeated_tool_id_becomes_newest(self, handler):
+        """Test a tool ID seen again is moved to the end and not evicted."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+
+        for ids in (["tool-a", "tool-b"], ["tool-a"]):
+            await handler.handle_update(
+                "proc",
+                StreamUpdate(
+                    type="assistant",
+                    tool_calls=[{"id": tool_id, "name": "Read"} for tool_id in ids],
+                ),
+            )
+
+        assert list(context.tool_messages) == ["tool-b", "tool-a"]
+
+        await handler.finalize_stream("proc", "done")
+
+
+class TestTodoBatching:
+    """Test todo updates ride along with content flushes."""
+
+    async def test_todos_flushed_with_content(self, handler, mock_bot):
+        """Test todo changes are sent on the flusher tick, not immediately."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        context.update_throttle = 0.05
+
+        await handler._handle_assistant_message(
+            context, StreamUpdate(type="assistant", content="- [ ] Task one\n")
+        )
+        assert context._todo_dirty
+        assert context.todo_message_id is None
+
+        await asyncio.sleep(0.01)
+        assert not context._todo_dirty
+        assert context.todo_message_id is not None
+        assert context.content_message_id is not None
+
+        await handler.finalize_stream("proc", "done")
+
+
+class TestScanAssistantDelta:
+    """Test incremental todo scanning over the accumulated buffer."""
+
+    def test_scans_only_complete_lines_after_offset(self):
+        """Test the delta scan stops at the last complete line."""
+        content = "- [ ] Old\n- [ ] New\n- [ ] Partial"
+
+        todos, offset = _scan_assistant_delta(content, 10)
+
+        assert todos == [{"content": "New", "status": "pending"}]
+        assert offset == content.index("- [ ] Partial")
+
+    def test_no_complete_line_keeps_offset(self):
+        """Test an unfinished line leaves the offset untouched."""
+        assert _scan_assistant_delta("- [ ] Partial", 0) == ([], 0)
+
+    def test_final_scan_includes_trailing_line(self):
+        """Test the final scan picks up the trailing partial line."""
+        content = "- [ ] Partial"
+        todos, offset = _scan_assistant_delta(content, 0, final=True)
+
+        assert todos == [{"content": "Partial", "status": "pending"}]
+        assert offset == len(content)
+
+
+class TestSafeTruncate:
+    """Test Markdown-aware truncation."""
+
+    def test_short_text_unchanged(self):
+        """Test text within the limit is returned as is."""
+        assert _safe_truncate("hello *world*", limit=100) == "hello *world*"
+
+    def test_cuts_at_line_break(self):
+        """Test truncation prefers the last newline before the limit."""
+        text = "first line\nsecond line that is long"
+        assert _safe_truncate(text, limit=20) == "first line"
+
+    def test_cuts_at_word_break(self):
+        """Test truncation falls back to the last space."""
+        text = "a" * 15 + " " + "b" * 20
+        assert _safe_truncate(text, limit=20) == "a" * 15
+
+    def test_closes_open_entities(self):
+        """Test unclosed bold and inline code are closed."""
+        text = "some *bold and `code " + "x" * 30
+        assert _safe_truncate(text, limit=25) == "some *bold and `code`*"
+
+    def test_ignores_delimiters_inside_code_spans(self):
+        """Test underscores and stars inside inline code aren't closed."""
+        text = "Use `snake_case` names. word " + "x" * 30
+        assert _safe_truncate(text, limit=35) == "Use `snake_case` names. word"
+
+        text = "Run `my_func` then check *results " + "x" * 30
+        assert _safe_truncate(text, limit=40) == "Run `my_func` then check *results*"
+
+    def test_closes_open_code_block(self):
+        """Test an unclosed code block is closed on its own line."""
+        text = "```python\nx = 1\ny = 2 * 3" + "z" * 30
+        assert _safe_truncate(text, limit=25) == "```python\nx = 1\n```"
+
+
+class TestMarkdownSafe:
+    """Test the Markdown balance heuristic."""
+
+    def test_balanced_markdown(self):
+        """Test balanced entities are safe."""
+        assert _markdown_safe("*bold* and _italic_ and `code`")
+
+    def test_unclosed_entities(self):
+        """Test unclosed bold, italic or code is unsafe."""
+        assert not _markdown_safe("*bold")
+        assert not _markdown_safe("_italic")
+        assert not _markdown_safe("```python\nx = 1")
+
+    def test_delimiters_inside_code_ignored(self):
+        """Test underscores and stars inside code don't count."""
+        assert _markdown_safe("Call `my_func(*args)` now")
+
+    async def test_unbalanced_content_sent_as_plain_text(self, handler, mock_bot):
+        """Test unbalanced partial content skips Markdown parsing."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        context.accumulated_content = "Working on *important"
+
+        await handler._update_content_message(context)
+
+        assert mock_bot.send_message.await_args.kwargs["parse_mode"] is None
+        await handler.finalize_stream("proc", "done")
+
+
+class TestChatGovernor:
+    """Test per-chat request queueing."""
+
+    async def test_requests_run_in_order(self, handler):
+        """Test queued requests for a chat run sequentially in order."""
+        calls = []
+
+        async def request(n):
+            calls.append(n)
+            await asyncio.sleep(0)
+            return n
+
+        results = await asyncio.gather(
+            *(handler._enqueue(100, lambda n=n: request(n)) for n in range(5))
+        )
+
+        assert results == [0, 1, 2, 3, 4]
+        assert calls == [0, 1, 2, 3, 4]
+
+    async def test_retry_after_pauses_and_retries(self, handler):
+        """Test flood control errors are retried after the given delay."""
+        request = AsyncMock(side_effect=[RetryAfter(0), "ok"])
+
+        assert await handler._enqueue(100, request) == "ok"
+        assert request.await_count == 2
+
+    async def test_errors_propagate_to_caller(self, handler):
+        """Test other request errors are raised to the caller."""
+        request = AsyncMock(side_effect=RuntimeError("boom"))
+
+        with pytest.raises(RuntimeError):
+            await handler._enqueue(100, request)
+
+    async def test_stale_edits_are_replaced(self, handler, mock_bot, monkeypatch):
+        """Test queued edits of one message collapse to the latest text."""
+        monkeypatch.setattr(live_streaming, "CHAT_RATE_LIMIT", 5.0)
+        context = await handler.start_stream(1, 100, 10, "proc")
+        loop = asyncio.get_running_loop()
+
+        start = loop.time()
+        for i in range(16):
+            await handler.handle_update(
+                "proc",
+                StreamUpdate(
+                    type="assistant", tool_calls=[{"id": f"t{i}", "name": f"T{i}"}]
+                ),
+            )
+
+        # Updates return without waiting for Telegram pacing
+        assert loop.time() - start < 0.1
+
+        # Once paced out, only a burst of edits plus the latest one were sent
+        await asyncio.sleep(0.3)
+        status_edits = edited_texts(mock_bot, context.status_message_id)
+        assert len(status_edits) <= live_streaming.CHAT_BURST
+        assert "T15" in status_edits[-1]
+
+        await handler.finalize_stream("proc", "done")
+
+    async def test_bucket_paces_bursts(self, handler, monkeypatch):
+        """Test requests beyond the burst are paced by the rate limit."""
+        monkeypatch.setattr(live_streaming, "CHAT_RATE_LIMIT", 50.0)
+        loop = asyncio.get_running_loop()
+        request = AsyncMock()
+
+        start = loop.time()
+        for _ in range(live_streaming.CHAT_BURST + 2):
+            await handler._enqueue(100, request)
+
+        assert loop.time() - start >= 2 / 50.0 * 0.9
+
+
+class TestConfigureRequest:
+    """Test HTTP connection pool configuration."""
+
+    def test_configure_request_sets_shared_pool(self, monkeypatch):
+        """Test the builder gets a sized pool and a separate polling pool."""
+        request_factory = Mock(side_effect=lambda **kwargs: Mock(kwargs=kwargs))
+        monkeypatch.setattr(live_streaming, "HTTPXRequest", request_factory)
+        builder = Mock()
+
+        assert LiveStreamHandler.configure_request(builder, timeout=12.5) is builder
+
+        request = builder.request.call_args.args[0]
+        updates_request = builder.get_updates_request.call_args.args[0]
+        timeouts = {
+            "connect_timeout": 12.5,
+            "read_timeout": 12.5,
+            "write_timeout": 12.5,
+            "pool_timeout": 12.5,
+        }
+        assert request.kwargs == {
+            "connection_pool_size": live_streaming.CONNECTION_POOL_SIZE,
+            "http_version": "1.1",
+            **timeouts,
+        }
+        assert updates_request.kwargs == {
+            "connection_pool_size": 1,
+            "http_version": "1.1",
+            **timeouts,
+        }
+
+    def test_configure_request_builds_real_requests(self):
+        """Test the configured requests are usable HTTPXRequest objects."""
+        builder = Mock()
+
+        LiveStreamHandler.configure_request(builder)
+
+        request = builder.request.call_args.args[0]
+        updates_request = builder.get_updates_request.call_args.args[0]
+        assert isinstance(request, HTTPXRequest)
+        assert isinstance(updates_request, HTTPXRequest)
+        assert request is not updates_request
+
+
+class TestCancellation:
+    """Test stream cancellation."""
+
+    async def test_cancel_stops_flusher_without_edits(self, handler, mock_bot):
+        """Test a cancelled stream sends no further content edits."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        context.update_throttle = 10
+
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", content="first")
+        )
+        await asyncio.sleep(0.01)
+        content_message_id = context.content_message_id
+
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", content=" second")
+        )
+        assert handler.request_cancel("proc")
+        assert handler.is_cancelled("proc")
+        await asyncio.sleep(0.01)
+
+        # Flusher exits on cancel instead of sleeping out the throttle
+        assert context._flush_task.done()
+
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", content=" third")
+        )
+        await handler.finalize_stream("proc", "cancelled", is_error=True)
+
+        assert edited_texts(mock_bot, content_message_id) == []
+        assert "third" not in context.accumulated_content
+
+    async def test_cancel_drops_queued_edits(self, handler, mock_bot, monkeypatch):
+        """Test edits still waiting on pacing are not sent after a cancel."""
+        monkeypatch.setattr(live_streaming, "CHAT_RATE_LIMIT", 5.0)
+        context = await handler.start_stream(1, 100, 10, "proc")
+        context.update_throttle = 10
+
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", content="first")
+        )
+        await settle()
+
+        # The burst is spent, so this edit waits for a token
+        context.accumulated_content += " second"
+        await handler._update_content_message(context)
+        handler.request_cancel("proc")
+        await asyncio.sleep(0.4)
+
+        assert edited_texts(mock_bot, context.content_message_id) == []
+        await handler.finalize_stream("proc", "cancelled", is_error=True)
+
+    async def test_cancel_during_send_keeps_message_id(self, handler, mock_bot):
+        """Test a send in flight at cancel still has its button removed."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+        send_message = mock_bot.send_message.side_effect
+
+        async def slow_send(**kwargs):
+            await asyncio.sleep(0.05)
+            return send_message(**kwargs)
+
+        mock_bot.send_message.side_effect = slow_send
+
+        await handler.handle_update(
+            "proc", StreamUpdate(type="assistant", content="Hello")
+        )
+        await asyncio.sleep(0.01)
+        handler.request_cancel("proc")
+        await handler.finalize_stream("proc", "cancelled", is_error=True)
+        await settle()
+
+        assert context.content_message_id is not None
+        cleared = [
+            call.kwargs["message_id"]
+            for call in mock_bot.edit_message_reply_markup.await_args_list
+        ]
+        assert context.content_message_id in cleared
+
+
+class TestProgress:
+    """Test progress status rendering."""
+
+    @pytest.mark.parametrize(
+        "percentage, bar",
+        [
+            (0, "░" * 10),
+            (45, "████░░░░░░"),
+            (100, "█" * 10),
+            (150, "█" * 10),
+        ],
+    )
+    async def test_progress_bar(self, handler, mock_bot, percentage, bar):
+        """Test progress bars are rendered and clamped."""
+        context = await handler.start_stream(1, 100, 10, "proc")
+
+        await handler.handle_update(
+            "proc",
+            StreamUpdate(
+                type="progress",
+                content="Indexing",
+                progress={"percentage": percentage},
+            ),
+        )
+        await settle()
+
+        status = edited_texts(mock_bot, context.status_message_id)[-1]
+        assert f"`{bar}` {percentage}%" in status
+        await handler.finalize_stream("proc", "done")